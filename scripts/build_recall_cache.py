@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# scripts/build_recall_cache.py
+"""
+Precompute a semantic query → top-k recall cache for fetchRecall.
+
+Embeds every prompt in a log, groups near-duplicates (cosine ≥ threshold)
+around a leader query, scores each leader against the recall corpus once,
+and writes the result to a compact JSON file:
+
+    corpus_sha1  sha1 of the corpus file bytes the cache was built from
+    corpus_ids   variant_id of every row fetchRecall keeps, in load order
+    leaders      base64 little-endian float32, n_clusters × dim, unit length
+                 (the first query of each cluster, not a mean)
+    results      {"ambiguous" | "low" | "medium" | "high": per cluster, the
+                 corpus indices of candidate rows}
+    scores       same shape as results: raw cosine score of each row
+    keys         sha1(normalized prompt)[:16] → cluster, for repeats that
+                 can skip the embedding call entirely
+
+The corpus is read from data/normalized/ and filtered with the same vector
+check as fetchRecall's loadCorpus, so indices line up with the runtime.
+
+filterAndRankRAG drops rows whose signal_label differs from the predicted
+signal (unless "ambiguous") and adds up to BOOST_MARGIN in boosts, so each
+cluster keeps one candidate list per signal: the "ambiguous" list ranks the
+whole corpus, the others only rows with that signal_label. Every list holds
+the top-k rows plus any row within BOOST_MARGIN of the k-th score, so no
+row left out can be boosted past the k rows kept. Running filterAndRankRAG
+on a list then gives the same top RECALL_TOP_N as a full scan, as long as
+RECALL_TOP_N ≤ top_k.
+
+A runtime loader must reject the cache (and fall back to a full scan)
+unless all of these hold:
+  - version == 2
+  - model == the EMBEDDING_MODEL used for queries
+  - dim == the loaded corpus dimension
+  - corpus_sha1 == sha1 of the corpus file it loaded
+  - corpus_ids equals the variant_ids of the loaded rows, in order
+  - RECALL_TOP_N ≤ top_k
+On a hit (exact key, or cosine to a leader ≥ threshold) it scores
+results[signal][cluster] with the stored scores and passes those rows to
+filterAndRankRAG.
+
+Finally the cache is replayed over a prompt log (the build log by default,
+which gives an upper bound — pass --replay for a held-out log) and hit
+rate plus estimated latency savings are printed.
+"""
+
+import argparse, base64, hashlib, json, os, re, sys, time
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from openai import OpenAI
+
+# ---------- CONFIG ----------
+ROOT        = Path(__file__).parent.parent
+CORPUS_PATH = ROOT / "data" / "normalized" / "therapy_corpus_embedded_expanded.json"
+OUT_PATH    = ROOT / "data" / "recall_cache.json"
+MODEL       = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+THRESHOLD   = 0.92     # min cosine for a query to reuse a cached result
+TOP_K       = 10       # rows kept per cluster list (≥ RECALL_TOP_N)
+BOOST_MARGIN = 0.15    # filterUtils SIGNAL_BOOST + TONE_BOOST
+SIGNALS     = ("low", "medium", "high")
+EMBED_BATCH = 100      # inputs per embeddings request
+LATENCY_PROBES = 5     # single-prompt calls used to time the embedding API
+# -----------------------------
+
+PUNCT = re.compile(r"[^\w\s]")
+
+
+def normalize_prompt(text: str) -> str:
+    return " ".join(PUNCT.sub("", text.lower()).split())
+
+
+def prompt_key(text: str) -> str:
+    return hashlib.sha1(normalize_prompt(text).encode("utf-8")).hexdigest()[:16]
+
+
+def read_prompts(path: Path) -> List[str]:
+    """Plain text (one prompt per line), JSONL or JSON array of {"prompt": …}."""
+    raw = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        rows = json.loads(raw)
+    elif path.suffix == ".jsonl":
+        rows = [json.loads(line) for line in raw.splitlines() if line.strip()]
+    else:
+        rows = [{"prompt": line} for line in raw.splitlines()]
+    prompts = [(r.get("prompt") or "").strip() for r in rows]
+    return [p for p in prompts if p]
+
+
+def unit_rows(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def is_runtime_vector(v, dim: int) -> bool:
+    """Mirror of fetchRecall's isUnitVector: finite, unit length, right size."""
+    if not isinstance(v, list) or not v or len(v) != dim:
+        return False
+    mag = float(np.dot(v, v))
+    return bool(np.isfinite(mag)) and abs(mag - 1) < 1e-3
+
+
+def load_corpus(path: Path) -> Tuple[str, List[str], List[str], np.ndarray]:
+    """Return (sha1 of file, ids, signal_labels, vectors) for the rows fetchRecall keeps."""
+    raw = path.read_bytes()
+    rows = json.loads(raw.decode("utf-8"))
+    first = next((r["embedding"] for r in rows if isinstance(r.get("embedding"), list)), [])
+    dim = int(os.getenv("EMBEDDING_DIM") or 0) or len(first)
+    rows = [r for r in rows if is_runtime_vector(r.get("embedding"), dim)]
+    if not rows:
+        sys.exit(f"❌  No valid embedded rows in {path} (run npm run corpus:build)")
+    ids = [r.get("variant_id") or f"{r.get('thread_id')}:{r.get('turn')}" for r in rows]
+    labels = [r.get("signal_label") for r in rows]
+    return (hashlib.sha1(raw).hexdigest(), ids, labels,
+            np.asarray([r["embedding"] for r in rows], dtype=np.float32))
+
+
+def embed_all(client: OpenAI, texts: List[str]) -> np.ndarray:
+    out: List[List[float]] = []
+    for i in range(0, len(texts), EMBED_BATCH):
+        resp = client.embeddings.create(model=MODEL, input=texts[i:i + EMBED_BATCH])
+        out.extend(d.embedding for d in resp.data)
+    return unit_rows(np.asarray(out, dtype=np.float32))
+
+
+def probe_embed_latency(client: OpenAI, texts: List[str]) -> float:
+    """Mean seconds for a single-prompt embedding call, as fetchRecall makes."""
+    samples = []
+    for text in texts[:LATENCY_PROBES]:
+        start = time.perf_counter()
+        client.embeddings.create(model=MODEL, input=text)
+        samples.append(time.perf_counter() - start)
+    return sum(samples) / len(samples) if samples else 0.0
+
+
+def cluster(queries: np.ndarray, threshold: float) -> Tuple[List[int], List[int]]:
+    """
+    Greedy leader clustering: a query joins the most similar existing leader
+    if it is within `threshold`, otherwise it becomes a new leader.
+    Returns (leader row indices, cluster index per query).
+    """
+    leaders: List[int] = []
+    assign: List[int] = []
+    buf = np.empty_like(queries)   # leader vectors, first len(leaders) rows used
+    for i, q in enumerate(queries):
+        n = len(leaders)
+        if n:
+            sims = buf[:n] @ q
+            best = int(np.argmax(sims))
+            if sims[best] >= threshold:
+                assign.append(best)
+                continue
+        buf[n] = q
+        leaders.append(i)
+        assign.append(n)
+    return leaders, assign
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    sims = queries @ corpus.T
+    k = min(k, corpus.shape[0])
+    idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(sims, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def candidates(sims: np.ndarray, cols: np.ndarray, k: int) -> Tuple[List[List[int]], List[List[float]]]:
+    """
+    Per leader row of `sims`, the top-k of `cols` plus every column within
+    BOOST_MARGIN of the k-th score, best first. Scores are rounded to the
+    stored precision before ranking and ties keep corpus order, so a stable
+    sort over the stored scores reproduces this order.
+    """
+    idx_out: List[List[int]] = []
+    score_out: List[List[float]] = []
+    for row in np.round(sims[:, cols].astype(np.float64), 4):
+        order = np.argsort(-row, kind="stable")
+        if len(order) > k:
+            cutoff = row[order[k - 1]] - BOOST_MARGIN
+            order = order[row[order] >= cutoff]
+        idx_out.append(cols[order].tolist())
+        score_out.append(row[order].tolist())
+    return idx_out, score_out
+
+
+def build(client: OpenAI, prompts: List[str], corpus_sha1: str, corpus_ids: List[str],
+          labels: List[str], corpus: np.ndarray, threshold: float, k: int) -> Dict:
+    # embed each distinct normalized prompt once
+    keys: Dict[str, int] = {}
+    uniq: List[str] = []
+    for p in prompts:
+        key = prompt_key(p)
+        if key not in keys:
+            keys[key] = len(uniq)
+            uniq.append(p)
+    print(f"🗂  {len(prompts)} prompts → {len(uniq)} distinct — embedding…")
+    emb = embed_all(client, uniq)
+
+    leaders, assign = cluster(emb, threshold)
+    leader_vecs = emb[leaders]
+    print(f"🔗  {len(uniq)} distinct prompts → {len(leaders)} clusters (≥ {threshold})")
+
+    sims = leader_vecs @ corpus.T
+    label_arr = np.asarray(labels, dtype=object)
+    results: Dict[str, List[List[int]]] = {}
+    scores: Dict[str, List[List[float]]] = {}
+    results["ambiguous"], scores["ambiguous"] = candidates(
+        sims, np.arange(corpus.shape[0]), k)
+    for signal in SIGNALS:
+        results[signal], scores[signal] = candidates(
+            sims, np.flatnonzero(label_arr == signal), k)
+
+    return {
+        "version": 2,
+        "model": MODEL,
+        "dim": int(corpus.shape[1]),
+        "threshold": threshold,
+        "top_k": k,
+        "corpus_sha1": corpus_sha1,
+        "corpus_ids": corpus_ids,
+        "leaders": base64.b64encode(leader_vecs.astype("<f4").tobytes()).decode("ascii"),
+        "results": results,
+        "scores": scores,
+        "keys": {key: assign[row] for key, row in keys.items()},
+    }
+
+
+def replay(client: OpenAI, cache: Dict, prompts: List[str], corpus: np.ndarray) -> None:
+    dim = cache["dim"]
+    leader_vecs = np.frombuffer(base64.b64decode(cache["leaders"]), dtype="<f4").reshape(-1, dim)
+    keys, threshold, k = cache["keys"], cache["threshold"], cache["top_k"]
+
+    misses = [p for p in prompts if prompt_key(p) not in keys]
+    emb = embed_all(client, misses) if misses else np.empty((0, dim), dtype=np.float32)
+    embed_s = probe_embed_latency(client, prompts)
+
+    semantic = 0
+    lookup_s = 0.0
+    for q in emb:
+        start = time.perf_counter()
+        hit = leader_vecs.shape[0] and float(np.max(leader_vecs @ q)) >= threshold
+        lookup_s += time.perf_counter() - start
+        semantic += bool(hit)
+    exact = len(prompts) - len(misses)
+
+    # time the uncached path on real query vectors (cluster leaders if every
+    # replayed prompt was an exact-key hit)
+    probes = emb if len(emb) else leader_vecs
+    start = time.perf_counter()
+    for q in probes:
+        top_k(corpus, q[None, :], k)
+    scan_each = (time.perf_counter() - start) / max(len(probes), 1)
+    lookup_each = lookup_s / max(len(emb), 1)
+
+    n = len(prompts)
+    # exact hits skip embedding + scan; semantic hits still embed, skip the
+    # scan; misses pay the leader lookup on top of the full scan
+    missed = len(misses) - semantic
+    saved = (exact * (embed_s + scan_each) + semantic * (scan_each - lookup_each)
+             - missed * lookup_each)
+    baseline = n * (embed_s + scan_each)
+
+    print(f"\n📊  Replay over {n} prompts")
+    print(f"  exact-key hits : {exact:>6}  ({exact / n:.1%})")
+    print(f"  semantic hits  : {semantic:>6}  ({semantic / n:.1%})")
+    print(f"  total hit rate : {(exact + semantic) / n:.1%}")
+    print(f"  embed call     : {embed_s * 1000:8.1f} ms (mean of {min(LATENCY_PROBES, n)} probes)")
+    print(f"  corpus scan    : {scan_each * 1000:8.3f} ms/query ({corpus.shape[0]} rows)")
+    print(f"  cache lookup   : {lookup_each * 1000:8.3f} ms/query ({leader_vecs.shape[0]} clusters)")
+    print(f"  est. saved     : {saved:.2f}s of {baseline:.2f}s ({saved / baseline if baseline else 0:.1%})")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("prompts", type=Path, help="prompt log (.txt, .jsonl or .json)")
+    ap.add_argument("--replay", type=Path, help="prompt log to replay (default: build log)")
+    ap.add_argument("--corpus", type=Path, default=CORPUS_PATH)
+    ap.add_argument("--out", type=Path, default=OUT_PATH)
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    ap.add_argument("--top-k", type=int, default=TOP_K)
+    args = ap.parse_args()
+
+    load_dotenv(".env.local", override=True)
+    if not os.getenv("OPENAI_API_KEY"):
+        raise RuntimeError("OPENAI_API_KEY not loaded")
+    client = OpenAI()
+
+    for p in (args.prompts, args.corpus, args.replay):
+        if p and not p.exists():
+            sys.exit(f"❌  {p} not found")
+
+    prompts = read_prompts(args.prompts)
+    if not prompts:
+        sys.exit(f"❌  No prompts in {args.prompts}")
+    corpus_sha1, corpus_ids, labels, corpus = load_corpus(args.corpus)
+
+    cache = build(client, prompts, corpus_sha1, corpus_ids, labels, corpus,
+                  args.threshold, args.top_k)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(cache, separators=(",", ":")))
+    print(f"✅  Wrote {len(cache['results']['ambiguous'])} clusters to {args.out}"
+          f" ({args.out.stat().st_size / 1024:.1f} KiB)")
+
+    replay_prompts = read_prompts(args.replay) if args.replay else prompts
+    if args.replay and not replay_prompts:
+        sys.exit(f"❌  No prompts in {args.replay}")
+    replay(client, cache, replay_prompts, corpus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# scripts/enrich_corpus_async.py
+"""
+Embed and tone-tag a corpus in one streaming pass.
+
+Rows are read from SRC (JSON array or JSONL), fanned out to embedding and
+tagging workers that run concurrently, and appended to DST as soon as both
+results for a row are in. Bounded queues keep the reader from racing ahead
+of the API, so wall time tracks the slower of the two stages instead of
+their sum.
+
+DST is written as a JSON array (indent=2, like the embed_new_entries*.py
+corpora) when it ends in .json, otherwise as JSONL. Rows come out in
+completion order, not source order. Output is streamed to DST.tmp and
+only moved onto DST once every row is written; a failed run leaves DST
+untouched.
+
+Rows that already carry an `embedding` / `tone_tags` skip that stage, and
+rows without `response_text` are written through untouched. Failed calls
+(rate limits included) are retried with exponential backoff.
+"""
+
+import asyncio, json, os, random, sys, time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+# ---------- CONFIG ----------
+EMBED_MODEL   = "text-embedding-3-small"
+TAG_MODEL     = "gpt-4o-mini"
+TAGS = [
+    "warm", "grounded", "clinical", "gentle",
+    "containment", "directive", "validating",
+    "reflective", "curious", "reassuring"
+]
+EMBED_WORKERS = 8      # concurrent embedding requests
+TAG_WORKERS   = 8      # concurrent tagging requests
+QUEUE_SIZE    = 64     # per-stage backlog before the reader blocks
+RETRIES       = 5      # attempts per API call before giving up
+BACKOFF       = 1.0    # seconds; doubled on each retry, plus jitter
+# -----------------------------
+
+load_dotenv(".env.local", override=True)
+if not os.getenv("OPENAI_API_KEY"):
+    raise RuntimeError("OPENAI_API_KEY not loaded")
+
+client = AsyncOpenAI()
+
+
+def read_rows(path: Path) -> Iterator[Dict]:
+    """Yield rows from a JSONL file line by line, or from a JSON array."""
+    if path.suffix == ".jsonl":
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from json.loads(path.read_text(encoding="utf-8"))
+
+
+async def get_embedding(text: str) -> List[float]:
+    resp = await client.embeddings.create(model=EMBED_MODEL, input=text)
+    return resp.data[0].embedding
+
+
+async def tag_single(text: str) -> List[str]:
+    prompt = (
+        "You are an expert tone classifier.\n"
+        f"Allowed tags: {', '.join(TAGS)}.\n"
+        "For the response below, return 2–3 **comma-separated** tone tags "
+        "from the allowed list—no explanations.\n\n"
+        f"RESPONSE:\n{text[:800]}\n"
+        "\nTAGS:"
+    )
+    res = await client.chat.completions.create(
+        model=TAG_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2
+    )
+    tags = [t.strip().lower() for t in res.choices[0].message.content.split(",")]
+    return [t for t in tags if t in TAGS]
+
+
+class Pipeline:
+    def __init__(self, dst: Path):
+        self.dst = dst
+        self.tmp = dst.with_name(dst.name + ".tmp")
+        self.embed_q: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        self.tag_q: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        self.write_q: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        # row index -> [row, stages still outstanding]
+        self.pending: Dict[int, list] = {}
+        self.written = 0
+        self.failed = 0
+
+    async def reader(self, src: Path) -> None:
+        for idx, row in enumerate(read_rows(src)):
+            text = (row.get("response_text") or "").strip()
+            if not text:
+                print(f"⚠️ No response_text, passing through: {row.get('variant_id')}")
+                await self.write_q.put(row)
+                continue
+            need_embed = not row.get("embedding")
+            need_tags = not row.get("tone_tags")
+            if not (need_embed or need_tags):
+                await self.write_q.put(row)
+                continue
+            self.pending[idx] = [row, need_embed + need_tags]
+            if need_embed:
+                await self.embed_q.put((idx, text))
+            if need_tags:
+                await self.tag_q.put((idx, text))
+
+    async def _stage_done(self, idx: int, field: Optional[str], value) -> None:
+        entry = self.pending[idx]
+        if field:
+            entry[0][field] = value
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.pending[idx]
+            await self.write_q.put(entry[0])
+
+    async def call_with_retry(self, fn, text: str):
+        for attempt in range(RETRIES):
+            try:
+                return await fn(text)
+            except Exception:
+                if attempt == RETRIES - 1:
+                    raise
+                await asyncio.sleep(BACKOFF * 2 ** attempt + random.uniform(0, BACKOFF))
+
+    async def worker(self, queue: asyncio.Queue, field: str, fn) -> None:
+        while True:
+            idx, text = await queue.get()
+            try:
+                value = await self.call_with_retry(fn, text)
+            except Exception as err:
+                # keep the row; the stage can be re-run on DST later
+                print(f"❌ {field} failed for row {idx} after {RETRIES} attempts: {err}")
+                self.failed += 1
+                await self._stage_done(idx, None, None)
+            else:
+                await self._stage_done(idx, field, value)
+            finally:
+                queue.task_done()
+
+    async def writer(self) -> None:
+        as_array = self.dst.suffix == ".json"
+        with self.tmp.open("w", encoding="utf-8") as f:
+            if as_array:
+                f.write("[")
+            try:
+                while True:
+                    row = await self.write_q.get()
+                    if as_array:
+                        f.write(",\n" if self.written else "\n")
+                        f.write(json.dumps(row, indent=2, ensure_ascii=False))
+                    else:
+                        json.dump(row, f, ensure_ascii=False)
+                        f.write("\n")
+                    self.written += 1
+                    self.write_q.task_done()
+            finally:
+                # runs when the pipeline cancels the writer; run() only keeps
+                # the file if every row made it
+                if as_array:
+                    f.write("\n]\n")
+
+    async def run(self, src: Path) -> None:
+        self.dst.parent.mkdir(parents=True, exist_ok=True)
+        tasks = [asyncio.create_task(self.writer())]
+        tasks += [
+            asyncio.create_task(self.worker(self.embed_q, "embedding", get_embedding))
+            for _ in range(EMBED_WORKERS)
+        ]
+        tasks += [
+            asyncio.create_task(self.worker(self.tag_q, "tone_tags", tag_single))
+            for _ in range(TAG_WORKERS)
+        ]
+        done = False
+        try:
+            await self.reader(src)
+            await self.embed_q.join()
+            await self.tag_q.join()
+            await self.write_q.join()
+            done = True
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if done:
+                os.replace(self.tmp, self.dst)
+            else:
+                self.tmp.unlink(missing_ok=True)
+
+
+def main(src: Path, dst: Path) -> None:
+    if not src.exists():
+        sys.exit(f"❌  {src} not found")
+    if dst.resolve() == src.resolve():
+        sys.exit("❌  DST must differ from SRC (DST is truncated while SRC is read)")
+    pipeline = Pipeline(dst)
+    start = time.perf_counter()
+    asyncio.run(pipeline.run(src))
+    elapsed = time.perf_counter() - start
+    print(f"✅  Wrote {pipeline.written} rows to {dst} in {elapsed:.1f}s"
+          f" ({pipeline.failed} failed stage calls)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: enrich_corpus_async.py SRC.json|SRC.jsonl DST.json|DST.jsonl")
+        sys.exit(1)
+    main(Path(sys.argv[1]), Path(sys.argv[2]))
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# scripts/validate_corpus.py
+"""
+Validate and normalize corpus files before they ship to retrieval.
+
+Every row is coerced to one schema:
+  response_text   ← response_text | response | assistant | text
+  signal_label    ← signal_label | signal_strength   (low / medium / high)
+  tone_tags       ← tone_tags | tags                  (always a list of
+                                                      known tags)
+  variants        plain strings become {"response_text": …}, dicts are
+                  coerced like top-level rows
+  turn            always a string
+
+When a row carries two aliases with different non-empty values (e.g.
+signal_label "low" and signal_strength "medium") that is an error; nothing
+is picked silently. tone_tags given as a stringified list ("['a', 'b']") and
+tags outside CLASSIFIER_TAGS + CURATED_TAGS are errors too, so they never
+reach filterAndRankRAG.
+
+Embeddings are checked per file in one NumPy pass (dimension, NaN/inf,
+zero vectors) and rewritten as unit vectors, so retrieval only needs a
+dot product. A file is either fully embedded or not embedded at all: once
+any row has an embedding, every row without one (absent or []) is an error.
+
+Normalized files go to data/normalized/ (same name and format). Any error
+fails the run with a short per-file report and nothing is written.
+
+fetchRecall loads its corpus from data/normalized/ and only checks the
+vectors there; regenerate it with `npm run corpus:build` after editing the
+source corpus (CI fails if the checked-in output is stale).
+
+With no paths, every corpus in data/ is checked except EXCLUDE; CI runs
+`npm run corpus:check` for that.
+
+Usage: validate_corpus.py [--check] [--dim N] [file.json|file.jsonl …]
+"""
+
+import argparse, json, re, sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# ---------- CONFIG ----------
+ROOT      = Path(__file__).parent.parent
+DATA_DIR  = ROOT / "data"
+OUT_DIR   = DATA_DIR / "normalized"
+DIM       = 1536       # text-embedding-3-small
+SIGNALS   = {"low", "medium", "high"}
+MAX_SHOWN = 5          # row indices listed per issue kind
+# tone-inference corpus for toneInference.ts: embedding + tone_tags only,
+# no response text by design
+EXCLUDE   = {"shrink_corpus_with_tone_tags.json"}
+# keep in sync with TAGS in tag_corpus.py / enrich_corpus_async.py
+CLASSIFIER_TAGS = {
+    "warm", "grounded", "clinical", "gentle",
+    "containment", "directive", "validating",
+    "reflective", "curious", "reassuring"
+}
+# hand-written tags used by the curated corpora
+CURATED_TAGS = {
+    "abandonment-aware", "accepting", "anger-aware", "attachment",
+    "attachment-informed", "boundary", "calming", "caring", "clarifying",
+    "compassionate", "conceptual", "deep", "depression-aware", "diagnostic",
+    "direct", "dissociation-informed", "empathetic", "empowering",
+    "empowerment", "encouraging", "expansive", "gentle-curiosity",
+    "grief-aware", "grounding", "guilt-aware", "hopeful", "identity",
+    "identity-aware", "identity-theory", "inherited-guilt", "inquisitive",
+    "insightful", "integrative", "invitation-to-sense", "kind", "liberatory",
+    "mindful", "minimalist", "mood-disorder", "nervous-system",
+    "nervous-system-aware", "nonjudgmental", "numbness-aware", "nurturing",
+    "observational", "performance-aware", "permission-giving", "polyvagal",
+    "present", "protective-reframe", "reframing", "regulation-focused",
+    "relational-clarity", "resilient", "restorative", "safe",
+    "self-compassion", "self-forgiveness", "shame-aware", "somatic",
+    "soothing", "steady", "strength-based", "supportive", "systems",
+    "therapeutic", "trust-building", "urgent", "validation",
+}
+ALLOWED_TAGS = CLASSIFIER_TAGS | CURATED_TAGS
+# -----------------------------
+
+LIST_LIKE     = re.compile(r"^\s*[\[(]")
+RESPONSE_KEYS = ("response_text", "response", "assistant", "text")
+SIGNAL_KEYS   = ("signal_label", "signal_strength")
+TAG_KEYS      = ("tone_tags", "tags")
+# rows shaped like chat fine-tune data or raw session transcripts
+NON_CORPUS_KEYS = {"messages", "speaker", "dialogue", "completion"}
+
+
+def read_rows(path: Path) -> List[Dict]:
+    if path.suffix == ".jsonl":
+        with path.open(encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return data if isinstance(data, list) else [data]
+
+
+def write_rows(path: Path, rows: List[Dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".jsonl":
+        with path.open("w", encoding="utf-8") as f:
+            for r in rows:
+                json.dump(r, f, ensure_ascii=False)
+                f.write("\n")
+    else:
+        path.write_text(json.dumps(rows, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def is_corpus(rows: List[Dict]) -> bool:
+    return bool(rows) and not any(NON_CORPUS_KEYS & r.keys() for r in rows if isinstance(r, dict))
+
+
+def pop_aliases(row: Dict, keys: Tuple[str, ...], norm=lambda v: v):
+    """
+    Remove every alias in `keys` from `row` and return (value, issue). The
+    value is the first non-empty alias; issue names the aliases if two of
+    them hold different values after `norm`.
+    """
+    found = [(k, row.pop(k)) for k in keys if row.get(k) not in (None, "", [])]
+    for k in keys:
+        row.pop(k, None)
+    if not found:
+        return None, None
+    if len({json.dumps(norm(v), sort_keys=True) for _, v in found}) > 1:
+        return found[0][1], "conflicting " + "/".join(k for k, _ in found)
+    return found[0][1], None
+
+
+def norm_text(v):
+    return v.strip() if isinstance(v, str) else v
+
+
+def norm_signal(v):
+    return str(v).strip().lower()
+
+
+def norm_tags(v):
+    if isinstance(v, str):
+        v = v.split(",")
+    return sorted(str(t).strip().lower() for t in v) if isinstance(v, list) else v
+
+
+def coerce_row(row: Dict) -> Tuple[Dict, List[str]]:
+    """Return (canonical row, issue kinds). Extra keys are kept as-is."""
+    out = dict(row)
+    issues: List[str] = []
+
+    response, conflict = pop_aliases(out, RESPONSE_KEYS, norm_text)
+    if conflict:
+        issues.append(conflict)
+    if isinstance(response, str):
+        out["response_text"] = response.strip()
+
+    signal, conflict = pop_aliases(out, SIGNAL_KEYS, norm_signal)
+    if conflict:
+        issues.append(conflict)
+    if signal is not None:
+        signal = norm_signal(signal)
+        if signal not in SIGNALS:
+            issues.append(f"bad signal_label {signal!r}")
+        out["signal_label"] = signal
+
+    tags, conflict = pop_aliases(out, TAG_KEYS, norm_tags)
+    if conflict:
+        issues.append(conflict)
+    if isinstance(tags, str):
+        if LIST_LIKE.match(tags):
+            issues.append("tone_tags is a stringified list")
+            tags = []
+        else:
+            tags = tags.split(",")
+    if tags is not None:
+        if not isinstance(tags, list):
+            issues.append("bad tone_tags type")
+            tags = []
+        tags = [str(t).strip().lower() for t in tags if str(t).strip()]
+        issues += [f"unknown tone_tag {t!r}" for t in tags if t not in ALLOWED_TAGS]
+        out["tone_tags"] = tags
+
+    if "turn" in out:
+        out["turn"] = str(out["turn"])
+    if isinstance(out.get("prompt"), str):
+        out["prompt"] = out["prompt"].strip()
+
+    if "variants" in out:
+        variants = []
+        for v in out["variants"] or []:
+            if isinstance(v, str):
+                v = {"response_text": v}
+            if not isinstance(v, dict):
+                issues.append("bad variant type")
+                continue
+            v, v_issues = coerce_row(v)
+            issues += [f"variant: {i}" for i in v_issues]
+            variants.append(v)
+        out["variants"] = variants
+        if not variants and not out.get("response_text"):
+            issues.append("no variants")
+    elif not out.get("response_text"):
+        issues.append("missing response_text")
+
+    return out, issues
+
+
+def check_embeddings(rows: List[Dict], dim: int) -> Tuple[Dict[str, List[int]], int]:
+    """
+    Validate and unit-normalize row["embedding"] in place for every row that
+    has a non-empty one. Returns (issue kind → row indices, rows embedded).
+    """
+    issues: Dict[str, List[int]] = defaultdict(list)
+    idx = [i for i, r in enumerate(rows) if r.get("embedding")]
+    if not idx:
+        return issues, 0
+    if len(idx) < len(rows):
+        embedded = set(idx)
+        issues["missing embedding"] = [i for i in range(len(rows)) if i not in embedded]
+
+    ok = []
+    for i in idx:
+        emb = rows[i]["embedding"]
+        if not isinstance(emb, list) or len(emb) != dim:
+            size = len(emb) if isinstance(emb, list) else type(emb).__name__
+            issues[f"embedding dim {size} != {dim}"].append(i)
+        else:
+            ok.append(i)
+    if not ok:
+        return issues, len(idx)
+
+    try:
+        mat = np.asarray([rows[i]["embedding"] for i in ok], dtype=np.float64)
+    except (TypeError, ValueError):
+        for i in ok:
+            issues["non-numeric embedding"].append(i)
+        return issues, len(idx)
+
+    finite = np.isfinite(mat).all(axis=1)
+    norms = np.linalg.norm(np.where(finite[:, None], mat, 0.0), axis=1)
+    zero = finite & (norms == 0)
+    for pos in np.flatnonzero(~finite):
+        issues["NaN/inf in embedding"].append(ok[pos])
+    for pos in np.flatnonzero(zero):
+        issues["zero-vector embedding"].append(ok[pos])
+
+    good = finite & ~zero
+    unit = mat[good] / norms[good, None]
+    for pos, vec in zip(np.flatnonzero(good), unit):
+        rows[ok[pos]]["embedding"] = vec.tolist()
+    return issues, len(idx)
+
+
+def validate_file(path: Path, dim: int) -> Tuple[Optional[List[Dict]], Dict[str, List[int]], int]:
+    """Return (canonical rows or None if not a corpus, issues, rows embedded)."""
+    rows = read_rows(path)
+    if not is_corpus(rows):
+        return None, {}, 0
+
+    issues: Dict[str, List[int]] = defaultdict(list)
+    out = []
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            issues["row is not an object"].append(i)
+            continue
+        canon, row_issues = coerce_row(row)
+        for kind in row_issues:
+            issues[kind].append(i)
+        out.append(canon)
+
+    emb_issues, embedded = check_embeddings(out, dim)
+    for kind, idx in emb_issues.items():
+        issues[kind].extend(idx)
+    return out, issues, embedded
+
+
+def default_paths() -> List[Path]:
+    return sorted(p for ext in ("*.json", "*.jsonl") for p in DATA_DIR.glob(ext)
+                  if p.name not in EXCLUDE)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Validate and normalize corpus files.")
+    ap.add_argument("paths", nargs="*", type=Path, help=f"default: {DATA_DIR}/*.json[l]")
+    ap.add_argument("--dim", type=int, default=DIM, help="expected embedding dimension")
+    ap.add_argument("--check", action="store_true", help="validate only, write nothing")
+    args = ap.parse_args()
+
+    paths = args.paths or default_paths()
+    results = []
+    failed = False
+    for path in paths:
+        if not path.exists():
+            sys.exit(f"❌  {path} not found")
+        try:
+            rows, issues, embedded = validate_file(path, args.dim)
+        except json.JSONDecodeError as err:
+            print(f"❌  {path.name}: invalid JSON ({err})")
+            failed = True
+            continue
+        if rows is None:
+            print(f"⏭   {path.name}: not a corpus file, skipped")
+            continue
+        n_bad = len({i for idx in issues.values() for i in idx})
+        mark = "❌ " if issues else "✅ "
+        print(f"{mark} {path.name}: {len(rows)} rows, {embedded} embedded, {n_bad} with issues")
+        for kind, idx in sorted(issues.items()):
+            shown = ", ".join(map(str, idx[:MAX_SHOWN]))
+            more = f", … +{len(idx) - MAX_SHOWN}" if len(idx) > MAX_SHOWN else ""
+            print(f"      {len(idx):>4} × {kind}  (rows {shown}{more})")
+        failed |= bool(issues)
+        results.append((path, rows))
+
+    if failed:
+        sys.exit("❌  Corpus validation failed — nothing written")
+    if args.check:
+        print("✅  All corpora valid")
+        return
+    for path, rows in results:
+        write_rows(OUT_DIR / path.name, rows)
+    print(f"✅  Wrote {len(results)} normalized corpora to {OUT_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import type { RecallEntry } from './fetchRecall';
+
+const mockReadFileSync = jest.fn();
+const mockEmbeddingsCreate = jest.fn();
+
+// factories read the shared mocks, so modules re-required under
+// jest.isolateModules see the same stubs
+jest.mock('fs', () => ({
+  ...jest.requireActual('fs'),
+  readFileSync: mockReadFileSync,
+}));
+
+jest.mock('./apiKeyLoader', () => ({
+  createOpenAIClient: () => ({
+    embeddings: { create: mockEmbeddingsCreate },
+  }),
+}));
+
+type CorpusRow = Omit<RecallEntry, 'embedding'> & { embedding: unknown };
+
+const row = (content: string, embedding: unknown): CorpusRow => ({
+  thread_id: content,
+  response_text: content,
+  discipline: 'test',
+  topic: content,
+  source: 'test',
+  content,
+  embedding,
+  signal_label: 'medium',
+  tone_tags: [],
+});
+
+const corpus = [
+  row('good-a', [1, 0, 0]),
+  row('good-b', [0.6, 0.8, 0]),
+  row('zero', [0, 0, 0]),
+  row('wrong-length', [1, 0]),
+  row('nan', [NaN, 0, 0]), // JSON.stringify writes null, like a real corpus file
+  row('overflow', [1e308, 1e308, 0]),
+  row('not-unit', [2, 0, 0]),
+];
+
+function loadFetchRecall() {
+  // fresh module state (corpus cache, dimension, warn-once flag) per test
+  let mod: typeof import('./fetchRecall') | undefined;
+  jest.isolateModules(() => {
+    mod = require('./fetchRecall');
+  });
+  return mod!.fetchRecall;
+}
+
+function embedAs(vector: number[]) {
+  mockEmbeddingsCreate.mockResolvedValue({ data: [{ embedding: vector }] });
+}
+
+describe('fetchRecall corpus checks', () => {
+  let warn: jest.SpyInstance;
+
+  beforeEach(() => {
+    mockReadFileSync.mockReturnValue(JSON.stringify(corpus));
+    mockEmbeddingsCreate.mockReset();
+    warn = jest.spyOn(console, 'warn').mockImplementation(() => {});
+    jest.spyOn(console, 'log').mockImplementation(() => {});
+  });
+
+  afterEach(() => {
+    jest.restoreAllMocks();
+  });
+
+  test('drops zero, wrong-length, non-finite and non-unit rows at load', async () => {
+    const fetchRecall = loadFetchRecall();
+    embedAs([3, 0, 0]);
+
+    const { recallUsed, results } = await fetchRecall('hello', [], 'ambiguous');
+
+    expect(recallUsed).toBe(true);
+    expect(results.map((r) => r.content)).toEqual(['good-a', 'good-b']);
+    expect(results[0].score).toBeCloseTo(1);
+    expect(results[1].score).toBeCloseTo(0.6);
+    expect(warn).toHaveBeenCalledWith(expect.stringContaining('Skipped 5 entries'));
+  });
+
+  test('disables recall when the query dimension does not match the corpus', async () => {
+    const fetchRecall = loadFetchRecall();
+    embedAs([1, 0]);
+
+    const first = await fetchRecall('hello', [], 'ambiguous');
+    const second = await fetchRecall('hello again', [], 'ambiguous');
+
+    expect(first).toEqual({ recallUsed: false, results: [] });
+    expect(second).toEqual({ recallUsed: false, results: [] });
+    const mismatchWarnings = warn.mock.calls.filter(([msg]) =>
+      String(msg).includes('does not match corpus dimension')
+    );
+    expect(mismatchWarnings).toHaveLength(1);
+  });
+});
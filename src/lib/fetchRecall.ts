@@ -25,12 +25,23 @@ export interface RetrievedChunk {
   score: number;
 }
 
+// Validated, unit-normalized output of scripts/validate_corpus.py
+// (`npm run corpus:build`; CI fails if it is stale)
 const CORPUS_FILES = [
-  path.join(process.cwd(), "data", "therapy_corpus_embedded_expanded.json"),
+  path.join(
+    process.cwd(),
+    "data",
+    "normalized",
+    "therapy_corpus_embedded_expanded.json"
+  ),
 ];
 
 // Cache the loaded corpus in memory
 let corpusCache: RecallEntry[] | null = null;
+// Embedding dimension shared by every cached entry
+let corpusDim = Number(process.env.EMBEDDING_DIM) || 0;
+let dimMismatchWarned = false;
+
 function loadCorpus(): RecallEntry[] {
   if (corpusCache) return corpusCache;
   const all: RecallEntry[] = [];
@@ -39,12 +50,29 @@ function loadCorpus(): RecallEntry[] {
     try {
       const raw = fs.readFileSync(filePath, "utf-8");
       const entries = JSON.parse(raw) as RecallEntry[];
+      let dropped = 0;
+      for (const entry of entries) {
+        if (!corpusDim && Array.isArray(entry.embedding)) {
+          corpusDim = entry.embedding.length;
+        }
+        if (!isUnitVector(entry.embedding, corpusDim)) {
+          dropped++;
+          continue;
+        }
+        all.push(entry);
+      }
       console.log(
-        `[RAG DEBUG] Loaded ${entries.length} entries from ${path.basename(
+        `[RAG DEBUG] Loaded ${entries.length - dropped} entries from ${path.basename(
           filePath
         )}`
       );
-      all.push(...entries);
+      if (dropped > 0) {
+        console.warn(
+          `[RAG DEBUG] Skipped ${dropped} entries without a finite unit-length ${corpusDim}-dim embedding in ${path.basename(
+            filePath
+          )} (run npm run corpus:build)`
+        );
+      }
     } catch (err) {
       console.warn(`[RAG DEBUG] Could not load corpus file: ${filePath}`, err);
     }
@@ -54,17 +82,30 @@ function loadCorpus(): RecallEntry[] {
   return all;
 }
 
-function cosineSimilarity(a: number[], b: number[]): number {
-  if (a.length !== b.length) return 0;
-  let dot = 0,
-    magA = 0,
-    magB = 0;
-  for (let i = 0; i < a.length; i++) {
-    dot += a[i] * b[i];
-    magA += a[i] ** 2;
-    magB += b[i] ** 2;
-  }
-  return magA && magB ? dot / (Math.sqrt(magA) * Math.sqrt(magB)) : 0;
+// Corpus vectors are normalized at build time; this only checks them.
+function isUnitVector(v: number[] | undefined, dim: number): boolean {
+  if (!Array.isArray(v) || v.length === 0 || v.length !== dim) return false;
+  let mag = 0;
+  for (let i = 0; i < v.length; i++) mag += v[i] ** 2;
+  return Number.isFinite(mag) && Math.abs(mag - 1) < 1e-3;
+}
+
+// Scale the query vector to unit length, so scoring is a plain dot product.
+// Returns null for empty, zero or non-finite vectors.
+function toUnitVector(v: number[] | undefined): number[] | null {
+  if (!Array.isArray(v) || v.length === 0) return null;
+  let mag = 0;
+  for (let i = 0; i < v.length; i++) mag += v[i] ** 2;
+  if (!mag || !Number.isFinite(mag)) return null;
+  mag = Math.sqrt(mag);
+  return v.map((x) => x / mag);
+}
+
+// Cosine similarity for unit vectors of equal length.
+function dotProduct(a: number[], b: number[]): number {
+  let dot = 0;
+  for (let i = 0; i < a.length; i++) dot += a[i] * b[i];
+  return dot;
 }
 
 export async function fetchRecall(
@@ -89,7 +130,9 @@ export async function fetchRecall(
       model: process.env.EMBEDDING_MODEL || "text-embedding-3-small",
       input: prompt,
     });
-    inputEmbedding = res.data[0].embedding;
+    const unit = toUnitVector(res.data[0].embedding);
+    if (!unit) throw new Error("Invalid input embedding");
+    inputEmbedding = unit;
 
     if (process.env.DEBUG_RAG === "true") {
       console.log(
@@ -108,13 +151,22 @@ export async function fetchRecall(
     console.warn("[RAG DEBUG] No corpus entries loaded");
     return { recallUsed: false, results: [] };
   }
+  if (inputEmbedding.length !== corpusDim) {
+    if (!dimMismatchWarned) {
+      console.warn(
+        `[RAG DEBUG] Query embedding dimension ${inputEmbedding.length} does not match corpus dimension ${corpusDim}; recall disabled`
+      );
+      dimMismatchWarned = true;
+    }
+    return { recallUsed: false, results: [] };
+  }
 
   if (process.env.DEBUG_RAG === "true") {
     console.log("[RAG DEBUG] Calculating cosine similarities...");
   }
   const scoredEntries = corpus.map((entry) => ({
     ...entry,
-    score: cosineSimilarity(inputEmbedding, entry.embedding),
+    score: dotProduct(inputEmbedding, entry.embedding),
   }));
   scoredEntries.sort((a, b) => b.score - a.score);
 